@@ -9,7 +9,7 @@ from database.supabase.operations import AgentsOperations, ProductsOperations
 from database.supabase.client import get_supabase_client
 from utils.wallet import create_wallet, encrypt_pk, send_eth_to_wallet
 from utils.chaoschain import create_chaoschain_agent
-from utils.image_upload import upload_product_image
+from utils.image_upload import upload_product_images
 from chaoschain_sdk import AgentRole
 
 router = APIRouter(prefix="/agent", tags=["agent"])
@@ -404,25 +404,27 @@ async def deploy_agent(
                     # Sort image keys to maintain order (product_0_image_0, product_0_image_1, etc.)
                     image_keys.sort()
                     
-                    # Upload each image
-                    for img_idx, image_key in enumerate(image_keys):
+                    # Collect the product's image files
+                    image_files = []
+                    for image_key in image_keys:
                         image_file = form_data[image_key]
                         if isinstance(image_file, UploadFile) and image_file.filename:
-                            logger.info(f"Found image {img_idx} for product {idx}: {image_file.filename}")
-                            
-                            # Upload image to Supabase Storage
-                            image_url = await upload_product_image(
-                                image_file,
-                                str(db_agent_id),
-                                idx,
-                                img_idx  # Pass image index
-                            )
-                            
-                            if image_url:
-                                product_image_urls.append(image_url)
-                                logger.info(f"✓ Product {idx} image {img_idx} uploaded: {image_url}")
-                            else:
-                                logger.warning(f"Failed to upload image {img_idx} for product {idx}")
+                            logger.info(f"Found image {len(image_files)} for product {idx}: {image_file.filename}")
+                            image_files.append(image_file)
+                    
+                    # Upload all images to Supabase Storage concurrently
+                    image_urls = await upload_product_images(
+                        image_files,
+                        str(db_agent_id),
+                        idx
+                    )
+                    
+                    for img_idx, image_url in enumerate(image_urls):
+                        if image_url:
+                            product_image_urls.append(image_url)
+                            logger.info(f"✓ Product {idx} image {img_idx} uploaded: {image_url}")
+                        else:
+                            logger.warning(f"Failed to upload image {img_idx} for product {idx}")
                     
                     # Insert product into database
                     created_product = products_ops.create_product(
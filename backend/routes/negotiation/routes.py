@@ -1,8 +1,10 @@
 import os
+import asyncio
 import logging
 from fastapi import APIRouter, HTTPException
 from typing import Dict, Any, List, Optional
 from uuid import UUID
+from eth_account import Account
 
 from .models import (
     NegotiateAndPayRequest,
@@ -13,7 +15,7 @@ from .models import (
 from database.supabase.operations import AgentsOperations, NegotiationsOperations
 from database.supabase.client import get_supabase_client
 from utils.wallet import decrypt_pk
-from utils.chaoschain import get_agent_sdk, execute_x402_payment
+from utils.chaoschain import get_agent_sdk, execute_x402_payment_async
 from chaoschain_sdk import AgentRole
 from services.shopping_service import ShoppingService
 
@@ -37,7 +39,8 @@ logger = logging.getLogger(__name__)
 # 3. Client SDK's PaymentManager is called directly (bypassing A2A extension)
 # 4. This ensures: from_agent=client, to_agent=merchant (correct flow!)
 #
-# See execute_x402_payment() in utils/chaoschain.py for full implementation.
+# See execute_x402_payment() / execute_x402_payment_async() in utils/chaoschain.py
+# for full implementation.
 # ============================================================================
 
 def validate_agent_id(agent_id: str) -> UUID:
@@ -130,13 +133,11 @@ def parse_agent_role(role_str: str, default_role: AgentRole) -> AgentRole:
         return default_role
 
 
-def initialize_agent_sdks(
+def prepare_agent_sdk_configs(
     client_agent: Dict[str, Any],
     merchant_agent: Dict[str, Any]
 ) -> tuple:
-    """Initialize SDKs for client and merchant agents."""
-    from eth_account import Account
-    
+    """Decrypt and verify both agents' keys and build the get_agent_sdk kwargs for each."""
     # Get encrypted private keys
     client_encrypted_pk = client_agent.get("private_key")
     merchant_encrypted_pk = merchant_agent.get("private_key")
@@ -190,26 +191,33 @@ def initialize_agent_sdks(
     client_role = parse_agent_role(client_meta["role_str"], AgentRole.CLIENT)
     merchant_role = parse_agent_role(merchant_meta["role_str"], AgentRole.SERVER)
     
-    # Initialize SDKs
     logger.info(f"Initializing Client SDK: {client_meta['name']} ({client_public_address or 'N/A'})")
-    client_sdk = get_agent_sdk(
-        agent_name=client_meta["name"],
-        agent_domain=client_meta["domain"],
-        private_key=client_private_key,
-        agent_role=client_role,
-        enable_payments=True
-    )
-    
     logger.info(f"Initializing Merchant SDK: {merchant_meta['name']} ({merchant_public_address or 'N/A'})")
-    merchant_sdk = get_agent_sdk(
-        agent_name=merchant_meta["name"],
-        agent_domain=merchant_meta["domain"],
-        private_key=merchant_private_key,
-        agent_role=merchant_role,
-        enable_payments=True
-    )
+    client_config = {
+        "agent_name": client_meta["name"],
+        "agent_domain": client_meta["domain"],
+        "private_key": client_private_key,
+        "agent_role": client_role,
+        "enable_payments": True
+    }
+    merchant_config = {
+        "agent_name": merchant_meta["name"],
+        "agent_domain": merchant_meta["domain"],
+        "private_key": merchant_private_key,
+        "agent_role": merchant_role,
+        "enable_payments": True
+    }
     
-    return client_sdk, merchant_sdk
+    return client_config, merchant_config
+
+
+def initialize_agent_sdks(
+    client_agent: Dict[str, Any],
+    merchant_agent: Dict[str, Any]
+) -> tuple:
+    """Initialize SDKs for client and merchant agents."""
+    client_config, merchant_config = prepare_agent_sdk_configs(client_agent, merchant_agent)
+    return get_agent_sdk(**client_config), get_agent_sdk(**merchant_config)
 
 
 def cleanup_temp_wallet_files(*sdks) -> None:
@@ -233,8 +241,16 @@ async def execute_payment_for_deal(
         }
     
     try:
-        # Initialize SDKs
-        client_sdk, merchant_sdk = initialize_agent_sdks(client_agent, merchant_agent)
+        # Initialize SDKs (key decryption, temp wallet file writes and SDK init
+        # are blocking, so keep them off the event loop). Client and merchant
+        # are independent, so build both concurrently
+        client_config, merchant_config = await asyncio.to_thread(
+            prepare_agent_sdk_configs, client_agent, merchant_agent
+        )
+        client_sdk, merchant_sdk = await asyncio.gather(
+            asyncio.to_thread(get_agent_sdk, **client_config),
+            asyncio.to_thread(get_agent_sdk, **merchant_config)
+        )
         
         try:
             # Get negotiation ID if available
@@ -251,7 +267,7 @@ async def execute_payment_for_deal(
                 raise ValueError("Merchant agent missing public_address field - required for payment")
             
             # Execute payment
-            payment_result = execute_x402_payment(
+            payment_result = await execute_x402_payment_async(
                 client_sdk=client_sdk,
                 merchant_sdk=merchant_sdk,
                 product_name=best_offer.get("product_name"),
@@ -40,6 +40,9 @@ from dotenv import load_dotenv
 # Add parent directory to path to import modules
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Load environment variables before importing utils.* (they read config at import time)
+load_dotenv()
+
 from database.supabase.client import get_supabase_client
 from database.supabase.operations import AgentsOperations
 from services.shopping_service import ShoppingService
@@ -47,9 +50,6 @@ from utils.wallet import decrypt_pk
 from utils.chaoschain import get_agent_sdk, execute_x402_payment
 from chaoschain_sdk import AgentRole, NetworkConfig
 
-# Load environment variables
-load_dotenv()
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
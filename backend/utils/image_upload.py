@@ -2,13 +2,113 @@
 Simple image upload utility for Supabase Storage
 """
 import os
+import asyncio
 import logging
-from typing import Optional
+from typing import List, Optional
 from fastapi import UploadFile
 from database.supabase.client import get_supabase_client
 
 logger = logging.getLogger(__name__)
 
+MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
+READ_CHUNK_SIZE = 256 * 1024
+ALLOWED_IMAGE_EXTENSIONS = frozenset({'jpg', 'jpeg', 'png', 'webp', 'gif'})
+
+# Signed URLs are valid for 100 years (3,153,600,000 seconds)
+SIGNED_URL_EXPIRATION_SECONDS = 100 * 365 * 24 * 60 * 60
+
+
+async def _read_upload(image_file: UploadFile) -> Optional[bytes]:
+    """Read an upload in chunks, returning None as soon as it exceeds MAX_IMAGE_SIZE."""
+    chunks = []
+    total_size = 0
+    while True:
+        chunk = await image_file.read(READ_CHUNK_SIZE)
+        if not chunk:
+            break
+        total_size += len(chunk)
+        if total_size > MAX_IMAGE_SIZE:
+            logger.error(f"File too large: more than {MAX_IMAGE_SIZE} bytes")
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _image_path(filename: Optional[str], agent_id: str, product_index: int, image_index: int) -> Optional[str]:
+    """
+    Build images/{agent_id}/product_{product_index}/image_{image_index}.{ext}.
+    
+    Returns None if the file extension is not an allowed image type.
+    """
+    _, sep, ext = (filename or "image.jpg").rpartition('.')
+    ext = ext.lower() if sep else 'jpg'
+    if ext not in ALLOWED_IMAGE_EXTENSIONS:
+        logger.error(f"Unsupported image extension: .{ext}")
+        return None
+    return f"images/{agent_id}/product_{product_index}/image_{image_index}.{ext}"
+
+
+async def _do_upload(bucket, file_content: bytes, file_path: str, content_type: Optional[str]) -> None:
+    """Upload bytes to the bucket (sync client - run off the event loop)."""
+    logger.info(f"Uploading image to products bucket: {file_path}")
+    await asyncio.to_thread(
+        bucket.upload,
+        path=file_path,
+        file=file_content,
+        file_options={
+            "content-type": content_type or "image/jpeg",
+            "upsert": "true"  # Overwrite if exists
+        }
+    )
+
+
+async def batch_signed_urls(paths: List[str]) -> List[Optional[str]]:
+    """
+    Get 100-year signed URLs for several files in the products bucket with one request.
+    
+    Args:
+        paths: Storage paths inside the products bucket
+    
+    Returns:
+        One URL per path (same order); the public URL is used for any path the
+        signed-URL request fails for, None if no URL could be produced
+    """
+    if not paths:
+        return []
+    
+    try:
+        bucket = get_supabase_client().storage.from_("products")
+    except Exception as e:
+        logger.error(f"Failed to get products bucket for image URLs: {str(e)}")
+        return [None] * len(paths)
+    
+    try:
+        signed = await asyncio.to_thread(
+            bucket.create_signed_urls,
+            paths,
+            SIGNED_URL_EXPIRATION_SECONDS
+        )
+    except Exception as url_error:
+        logger.warning(f"Failed to generate signed URLs: {str(url_error)}, using public URLs")
+        signed = []
+    
+    urls: List[Optional[str]] = []
+    for i, file_path in enumerate(paths):
+        entry = signed[i] if i < len(signed) else None
+        signed_url = entry.get('signedURL') if isinstance(entry, dict) else None
+        if signed_url:
+            urls.append(signed_url)
+            continue
+        # Fallback to public URL if this path has no signed URL
+        try:
+            urls.append(bucket.get_public_url(file_path))
+        except Exception as e:
+            logger.error(f"Failed to get public URL for {file_path}: {str(e)}")
+            urls.append(None)
+    
+    logger.info(f"✓ Generated {len(urls)} image URLs")
+    return urls
+
 
 async def upload_product_image(
     image_file: UploadFile,
@@ -27,63 +127,73 @@ async def upload_product_image(
     
     Returns:
         Signed URL of the uploaded image valid for 100 years, or None if upload fails
+        or the file is not a jpg/jpeg/png/webp/gif
     """
     try:
-        client = get_supabase_client()
-        
-        # Read file content
-        file_content = await image_file.read()
-        
-        # Check file size (5MB max)
-        if len(file_content) > 5 * 1024 * 1024:
-            logger.error(f"File too large: {len(file_content)} bytes")
+        file_path = _image_path(image_file.filename, agent_id, product_index, image_index)
+        if file_path is None:
             return None
         
-        # Get file extension
-        filename = image_file.filename or "image.jpg"
-        ext = filename.split('.')[-1] if '.' in filename else 'jpg'
-        
-        # Create path: images/{agent_id}/product_{product_index}/image_{image_index}.{ext}
-        file_path = f"images/{agent_id}/product_{product_index}/image_{image_index}.{ext}"
-        
-        logger.info(f"Uploading image to products bucket: {file_path}")
-        
-        # Upload to Supabase Storage
-        response = client.storage.from_("products").upload(
-            path=file_path,
-            file=file_content,
-            file_options={
-                "content-type": image_file.content_type or "image/jpeg",
-                "upsert": "true"  # Overwrite if exists
-            }
-        )
+        file_content = await _read_upload(image_file)
+        if file_content is None:
+            return None
         
-        # Generate signed URL valid for 100 years (3,153,600,000 seconds)
-        expiration_seconds = 100 * 365 * 24 * 60 * 60  # 100 years
-        try:
-            signed_url_response = client.storage.from_("products").create_signed_url(
-                path=file_path,
-                expires_in=expiration_seconds
-            )
-            
-            if signed_url_response and 'signedURL' in signed_url_response:
-                signed_url = signed_url_response['signedURL']
-                logger.info(f"✓ Image uploaded successfully with 100-year URL: {signed_url}")
-                return signed_url
-            else:
-                # Fallback to public URL if signed URL format is unexpected
-                logger.warning(f"Signed URL response format unexpected, falling back to public URL")
-                public_url = client.storage.from_("products").get_public_url(file_path)
-                logger.info(f"✓ Image uploaded successfully (public URL): {public_url}")
-                return public_url
-        except Exception as url_error:
-            # Fallback to public URL if signed URL generation fails
-            logger.warning(f"Failed to generate signed URL: {str(url_error)}, using public URL")
-            public_url = client.storage.from_("products").get_public_url(file_path)
-            logger.info(f"✓ Image uploaded successfully (public URL fallback): {public_url}")
-            return public_url
+        bucket = get_supabase_client().storage.from_("products")
         
+        await _do_upload(bucket, file_content, file_path, image_file.content_type)
+        return (await batch_signed_urls([file_path]))[0]
+    
     except Exception as e:
         logger.error(f"Failed to upload product image: {str(e)}")
         return None
 
+
+async def upload_product_images(
+    image_files: List[UploadFile],
+    agent_id: str,
+    product_index: int
+) -> List[Optional[str]]:
+    """
+    Upload all images of a product concurrently and return their URLs.
+    
+    Uploads run in parallel, then the signed URLs are generated with a single
+    batched request, so an M-image product costs roughly one upload + one URL
+    round-trip of wall-clock time instead of M of each.
+    
+    Args:
+        image_files: The uploaded files, in image order
+        agent_id: UUID of the agent
+        product_index: Index of the product (0, 1, 2, etc.)
+    
+    Returns:
+        One URL per input file (same order), None for files that failed to upload
+    """
+    async def _upload_one(image_index: int, image_file: UploadFile) -> Optional[str]:
+        file_path = _image_path(image_file.filename, agent_id, product_index, image_index)
+        if file_path is None:
+            return None
+        file_content = await _read_upload(image_file)
+        if file_content is None:
+            return None
+        # Inside the per-image error handling: a client/config error fails the image, not the caller
+        bucket = get_supabase_client().storage.from_("products")
+        await _do_upload(bucket, file_content, file_path, image_file.content_type)
+        return file_path
+    
+    upload_results = await asyncio.gather(
+        *(_upload_one(i, f) for i, f in enumerate(image_files)),
+        return_exceptions=True
+    )
+    
+    file_paths: List[Optional[str]] = []
+    for result in upload_results:
+        if isinstance(result, Exception):
+            logger.error(f"Failed to upload product image: {str(result)}")
+            file_paths.append(None)
+        else:
+            file_paths.append(result)
+    
+    # One signed-URL request for all uploaded images
+    uploaded_paths = [path for path in file_paths if path]
+    url_by_path = dict(zip(uploaded_paths, await batch_signed_urls(uploaded_paths)))
+    return [url_by_path.get(path) if path else None for path in file_paths]
@@ -1,44 +1,248 @@
 import os
-import base64
+import re
 import hashlib
 import logging
-from typing import Dict, Optional
+import time
+import functools
+from decimal import Decimal
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+import requests
+from requests.adapters import HTTPAdapter
 from eth_account import Account
+from eth_account.signers.local import LocalAccount
 from web3 import Web3
-from nacl import secret, utils
+from web3.exceptions import TimeExhausted, TransactionNotFound
+from nacl import secret
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+try:
+    import pybase64 as base64  # optional: SIMD base64, same API as the stdlib module
+except ImportError:
+    import base64
 
 logger = logging.getLogger(__name__)
 
+# Ciphertexts written by encrypt_pk are "v2:" + base64(nonce || AES-GCM ciphertext).
+# Values without the prefix are legacy NaCl SecretBox ciphertexts (base64).
+_AESGCM_PREFIX = "v2:"
+_AESGCM_NONCE_SIZE = 12
 
-def create_wallet() -> Dict[str, str]:
+# SHA256 digests are used directly as 32-byte SecretBox / AES-256 keys
+assert hashlib.sha256().digest_size == secret.SecretBox.KEY_SIZE == 32
+
+_HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+_HEX64 = re.compile(r'[0-9a-fA-F]{64}').fullmatch
+_ADDR = re.compile(r'0x[0-9a-fA-F]{40}').fullmatch
+
+
+def _is_hex(value: str) -> bool:
+    """True if every character is a hex digit (single C-level pass, no per-char Python loop)."""
+    return _HEX_DIGITS.issuperset(value)
+
+
+@functools.lru_cache(maxsize=8)
+def _box_for(user_secret: str) -> secret.SecretBox:
     """
-    Create a new Ethereum wallet.
+    Build the SecretBox for a user secret (cached; the secret comes from config, not requests).
+    
+    The key is the SHA256 hash of the secret, as PyNaCl SecretBox needs a 32-byte key.
+    """
+    return secret.SecretBox(hashlib.sha256(user_secret.encode()).digest())
+
+
+@functools.lru_cache(maxsize=8)
+def _aesgcm_for(user_secret: str) -> AESGCM:
+    """Build the AES-GCM cipher for a user secret (same SHA256-derived 32-byte key, cached)."""
+    return AESGCM(hashlib.sha256(user_secret.encode()).digest())
+
+
+@functools.lru_cache(maxsize=8)
+def _get_web3(endpoint: str) -> Web3:
+    """Get the shared Web3 client for an RPC endpoint, backed by a keep-alive session."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return Web3(Web3.HTTPProvider(endpoint, request_kwargs={'timeout': 30}, session=session))
+
+
+BASE_SEPOLIA_CHAIN_ID = 84532
+
+# Endpoints whose chain ID has already been confirmed as Base Sepolia
+# (dropped again as soon as a transfer hits a connection error on them)
+_VALIDATED_ENDPOINTS: Set[str] = set()
+
+
+# Admin accounts keyed by a digest of the private key, never the raw key
+_ADMIN_ACCOUNTS_MAX_SIZE = 4
+_ADMIN_ACCOUNTS: Dict[bytes, LocalAccount] = {}
+
+
+def _admin_account(admin_private_key: Union[str, bytes]) -> LocalAccount:
+    """Load the admin account once per key (secp256k1 derivation cached per key hash)."""
+    key_bytes = admin_private_key.encode() if isinstance(admin_private_key, str) else bytes(admin_private_key)
+    key_hash = hashlib.blake2b(key_bytes, digest_size=16).digest()
+    account = _ADMIN_ACCOUNTS.get(key_hash)
+    if account is None:
+        account = Account.from_key(admin_private_key)
+        if len(_ADMIN_ACCOUNTS) >= _ADMIN_ACCOUNTS_MAX_SIZE:
+            _ADMIN_ACCOUNTS.clear()
+        _ADMIN_ACCOUNTS[key_hash] = account
+    return account
+
+
+# EIP-1559 priority fee (tip). Base blocks are rarely full, so a small tip is enough
+_PRIORITY_FEE_WEI = Web3.to_wei(Decimal(os.getenv("BASE_PRIORITY_FEE_GWEI") or "0.001"), 'gwei')
+
+
+def _base_fee_and_nonce(w3: Web3, address: str) -> Tuple[int, int]:
+    """
+    Fetch the latest block's base fee and the pending nonce for an address.
+    
+    Both calls go out as one JSON-RPC batch (a single HTTP round-trip); RPCs
+    that reject batches fall back to two sequential calls.
+    """
+    try:
+        with w3.batch_requests() as batch:
+            batch.add(w3.eth.get_block('latest'))
+            batch.add(w3.eth.get_transaction_count(address))
+            latest_block, nonce = batch.execute()
+    except Exception as e:
+        logger.warning("Batched RPC request failed (%s), falling back to sequential calls", e)
+        latest_block = w3.eth.get_block('latest')
+        nonce = w3.eth.get_transaction_count(address)
+    return latest_block['baseFeePerGas'], nonce
+
+
+def _wait_for_receipt(w3: Web3, tx_hash: bytes, timeout: float = 120) -> Any:
+    """
+    Poll for a transaction receipt with exponential backoff (0.5s doubling to 4s).
+    
+    web3's wait_for_transaction_receipt polls every 0.1s, which gets public RPCs
+    to rate-limit us and ends up delaying confirmation.
+    
+    Raises:
+        TimeExhausted: If no receipt is available after `timeout` seconds
+    """
+    deadline = time.monotonic() + timeout
+    delay = 0.5
+    while True:
+        try:
+            return w3.eth.get_transaction_receipt(tx_hash)
+        except TransactionNotFound:
+            pass
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeExhausted(f"Transaction {tx_hash.hex()} is not in the chain after {timeout} seconds")
+        time.sleep(min(delay, remaining))
+        delay = min(delay * 2, 4)
+
+
+_RPC_PROBE_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rpc-probe")
+
+
+def _probe_endpoint(endpoint: str) -> Web3:
+    """
+    Connect to an RPC endpoint and confirm it serves Base Sepolia.
+    
+    Raises:
+        ConnectionError: If the endpoint is unreachable or on the wrong chain
+    """
+    w3 = _get_web3(endpoint)
+    logger.info("Attempting to connect to Base Sepolia RPC: %s", endpoint)
+    
+    # Test connection by making an actual RPC call (more reliable than is_connected())
+    try:
+        chain_id = w3.eth.chain_id
+    except Exception as chain_test_error:
+        # If chain_id check fails, try is_connected() as fallback
+        if w3.is_connected():
+            logger.info("✓ Successfully connected to Base Sepolia RPC: %s", endpoint)
+            return w3
+        raise ConnectionError(f"Connection test failed for {endpoint}: {str(chain_test_error)}")
+    
+    if chain_id != BASE_SEPOLIA_CHAIN_ID:
+        raise ConnectionError(f"Wrong chain ID {chain_id} for {endpoint} (expected {BASE_SEPOLIA_CHAIN_ID})")
+    
+    logger.info("✓ Successfully connected to Base Sepolia RPC: %s (Chain ID: %s)", endpoint, chain_id)
+    _VALIDATED_ENDPOINTS.add(endpoint)
+    return w3
+
+
+def _connect_base_sepolia(rpc_endpoints: List[str]) -> Web3:
+    """
+    Return a Web3 client for the fastest healthy Base Sepolia endpoint.
+    
+    An already-validated primary endpoint is used directly; otherwise all
+    endpoints are probed concurrently and the first to answer correctly wins,
+    so a slow or dead primary costs one probe timeout at most rather than one
+    per endpoint.
+    """
+    if rpc_endpoints[0] in _VALIDATED_ENDPOINTS:
+        return _get_web3(rpc_endpoints[0])
+    
+    futures = {_RPC_PROBE_EXECUTOR.submit(_probe_endpoint, endpoint): endpoint for endpoint in rpc_endpoints}
+    connection_error = None
+    for future in as_completed(futures):
+        try:
+            w3 = future.result()
+        except Exception as e:
+            connection_error = f"Error connecting to {futures[future]}: {str(e)}"
+            logger.warning(connection_error)
+            continue
+        for other in futures:
+            other.cancel()
+        return w3
+    
+    raise ConnectionError(
+        f"Failed to connect to any Base Sepolia RPC endpoint. "
+        f"Tried: {', '.join(rpc_endpoints)}. "
+        f"Last error: {connection_error}. "
+        f"Please set BASE_RPC_URL in environment with a valid endpoint."
+    )
+
+
+def create_wallet_bytes() -> Dict[str, Any]:
+    """
+    Create a new Ethereum wallet, keeping the private key as raw bytes.
     
     Returns:
-        Dictionary with address and private_key (hex string)
+        Dictionary with address and private_key (32 raw bytes)
     """
     try:
         acct = Account.create()
-        # eth-account uses .key attribute (HexBytes), convert to hex string
         return {
             "address": acct.address,
-            "private_key": acct.key.hex()
+            "private_key": bytes(acct.key)
         }
     except Exception as e:
         logger.error(f"Error creating wallet: {str(e)}")
         raise
 
 
+def create_wallet() -> Dict[str, str]:
+    """
+    Create a new Ethereum wallet.
+    
+    Returns:
+        Dictionary with address and private_key (hex string)
+    """
+    wallet = create_wallet_bytes()
+    wallet["private_key"] = wallet["private_key"].hex()
+    return wallet
+
+
 def encrypt_pk(private_key: str, user_secret: str = None) -> str:
     """
-    Encrypt a private key using NaCl secret box.
+    Encrypt a private key using AES-256-GCM.
     
     Args:
         private_key: The private key to encrypt (hex string)
         user_secret: Secret key for encryption (defaults to env var)
     
     Returns:
-        Base64-encoded encrypted private key
+        "v2:"-prefixed base64-encoded nonce and encrypted private key
     """
     try:
         # Get user secret from parameter or environment variable
@@ -49,21 +253,12 @@ def encrypt_pk(private_key: str, user_secret: str = None) -> str:
                     "USER_SECRET_KEY must be set in environment variables or passed as parameter"
                 )
         
-        # Generate key from user secret using SHA256 hash
-        # PyNaCl SecretBox needs a 32-byte key
-        key = hashlib.sha256(user_secret.encode()).digest()
-        
-        # Ensure key is exactly 32 bytes (SecretBox.KEY_SIZE)
-        if len(key) != secret.SecretBox.KEY_SIZE:
-            key = key[:secret.SecretBox.KEY_SIZE]
-        
-        # Create secret box and encrypt
-        box = secret.SecretBox(key)
-        nonce = utils.random(secret.SecretBox.NONCE_SIZE)
-        encrypted = box.encrypt(private_key.encode(), nonce)
+        # Get (cached) AES-GCM cipher and encrypt
+        nonce = os.urandom(_AESGCM_NONCE_SIZE)
+        encrypted = _aesgcm_for(user_secret).encrypt(nonce, private_key.encode(), None)
         
-        # Return base64-encoded encrypted data
-        return base64.b64encode(encrypted).decode()
+        # Return versioned, base64-encoded nonce + encrypted data
+        return _AESGCM_PREFIX + base64.b64encode(nonce + encrypted).decode('ascii')
         
     except Exception as e:
         logger.error(f"Error encrypting private key: {str(e)}")
@@ -72,22 +267,26 @@ def encrypt_pk(private_key: str, user_secret: str = None) -> str:
 
 def decrypt_pk(encrypted_private_key: str, user_secret: str = None) -> str:
     """
-    Decrypt a private key using NaCl secret box.
+    Decrypt a private key encrypted with AES-GCM ("v2:" prefix) or NaCl secret box (legacy).
     Also handles plaintext private keys for backward compatibility.
     
     Args:
-        encrypted_private_key: Base64-encoded encrypted private key OR plaintext hex string
+        encrypted_private_key: Encrypted private key from encrypt_pk, legacy base64-encoded
+            SecretBox ciphertext, OR plaintext hex string
         user_secret: Secret key for decryption (defaults to env var)
     
     Returns:
         Decrypted private key (hex string, without 0x prefix)
     """
     try:
-        # DEBUG: Print what we received
-        logger.info(f"DEBUG: Attempting to decrypt private key")
-        logger.info(f"DEBUG: Key length: {len(encrypted_private_key) if encrypted_private_key else 0}")
-        logger.info(f"DEBUG: Key preview (first 50 chars): {encrypted_private_key[:50] if encrypted_private_key else 'None'}...")
-        logger.info(f"DEBUG: Key preview (last 50 chars): ...{encrypted_private_key[-50:] if encrypted_private_key and len(encrypted_private_key) > 50 else encrypted_private_key}")
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug(
+                "Attempting to decrypt private key (length: %d, preview: %s...%s)",
+                len(encrypted_private_key) if encrypted_private_key else 0,
+                encrypted_private_key[:50] if encrypted_private_key else None,
+                encrypted_private_key[-50:] if encrypted_private_key and len(encrypted_private_key) > 50 else ""
+            )
         
         # First, check if it's already a plaintext private key
         # Private keys are 64 hex characters (32 bytes), optionally prefixed with 0x
@@ -96,8 +295,8 @@ def decrypt_pk(encrypted_private_key: str, user_secret: str = None) -> str:
             cleaned_key = cleaned_key[2:]
         
         # Check if it looks like a plaintext hex private key (64 hex chars)
-        if len(cleaned_key) == 64 and all(c in '0123456789abcdefABCDEF' for c in cleaned_key):
-            logger.info("DEBUG: Private key appears to be in plaintext format (64 hex chars), returning as-is")
+        if _HEX64(cleaned_key):
+            logger.debug("Private key appears to be in plaintext format (64 hex chars), returning as-is")
             return cleaned_key.lower()  # Return lowercase hex without 0x prefix
         
         # If not plaintext, try to decrypt it
@@ -109,53 +308,59 @@ def decrypt_pk(encrypted_private_key: str, user_secret: str = None) -> str:
                     "USER_SECRET_KEY must be set in environment variables or passed as parameter"
                 )
         
-        logger.info(f"DEBUG: USER_SECRET_KEY length: {len(user_secret)}")
-        logger.info(f"DEBUG: USER_SECRET_KEY preview: {user_secret[:10]}...")
-        
-        # Generate key from user secret using SHA256 hash
-        key = hashlib.sha256(user_secret.encode()).digest()
+        if debug:
+            logger.debug("USER_SECRET_KEY length: %d", len(user_secret))
         
-        # Ensure key is exactly 32 bytes (SecretBox.KEY_SIZE)
-        if len(key) != secret.SecretBox.KEY_SIZE:
-            key = key[:secret.SecretBox.KEY_SIZE]
+        if encrypted_private_key.startswith(_AESGCM_PREFIX):
+            encrypted_data = base64.b64decode(encrypted_private_key[len(_AESGCM_PREFIX):])
+            nonce = encrypted_data[:_AESGCM_NONCE_SIZE]
+            decrypted = _aesgcm_for(user_secret).decrypt(nonce, encrypted_data[_AESGCM_NONCE_SIZE:], None)
+            return decrypted.decode().removeprefix("0x")
         
-        # Decode base64-encoded encrypted data
+        # Legacy: decode base64-encoded SecretBox data
         try:
-            encrypted_data = base64.b64decode(encrypted_private_key.encode())
-            logger.info(f"DEBUG: Successfully decoded base64, encrypted data length: {len(encrypted_data)}")
+            encrypted_data = base64.b64decode(encrypted_private_key)
+            if debug:
+                logger.debug("Successfully decoded base64, encrypted data length: %d", len(encrypted_data))
         except Exception as e:
-            logger.error(f"DEBUG: Failed to base64 decode private key. Error: {str(e)}")
+            logger.error(f"Failed to base64 decode private key. Error: {str(e)}")
             # If base64 decode fails, check if it's a hex string
-            if all(c in '0123456789abcdefABCDEF' for c in cleaned_key):
-                logger.warning("DEBUG: Private key appears to be plaintext hex (not base64), returning as-is")
+            if _is_hex(cleaned_key):
+                logger.warning("Private key appears to be plaintext hex (not base64), returning as-is")
                 return cleaned_key.lower()
             raise ValueError(f"Invalid encrypted private key format: {str(e)}")
         
-        # Create secret box and decrypt
-        box = secret.SecretBox(key)
-        logger.info("DEBUG: Attempting decryption with SecretBox...")
+        # Get (cached) secret box and decrypt
+        box = _box_for(user_secret)
+        logger.debug("Attempting decryption with SecretBox...")
         decrypted = box.decrypt(encrypted_data)
-        logger.info(f"DEBUG: Decryption successful! Decrypted length: {len(decrypted)}")
+        if debug:
+            logger.debug("Decryption successful! Decrypted length: %d", len(decrypted))
         
         # Return decrypted private key as string (remove 0x if present)
         decrypted_str = decrypted.decode()
         if decrypted_str.startswith("0x"):
             decrypted_str = decrypted_str[2:]
-        logger.info(f"DEBUG: Final decrypted key preview: {decrypted_str[:20]}...")
         return decrypted_str
         
     except Exception as e:
-        logger.error(f"Error decrypting private key: {str(e)}")
-        logger.error(f"DEBUG: Full error traceback:")
-        import traceback
-        logger.error(traceback.format_exc())
+        logger.error(f"Error decrypting private key: {str(e)}", exc_info=True)
         raise
 
 
+def decrypt_pk_bytes(encrypted_private_key: str, user_secret: str = None) -> bytes:
+    """
+    Decrypt a private key (see decrypt_pk) and return it as 32 raw bytes.
+    
+    Stored plaintexts are hex text, so this is a single hex decode on top of decrypt_pk.
+    """
+    return bytes.fromhex(decrypt_pk(encrypted_private_key, user_secret))
+
+
 def send_eth_to_wallet(
     recipient_address: str,
     amount_eth: str,
-    admin_private_key: Optional[str] = None,
+    admin_private_key: Optional[Union[str, bytes]] = None,
     rpc_url: Optional[str] = None
 ) -> Dict[str, str]:
     """
@@ -164,12 +369,14 @@ def send_eth_to_wallet(
     Args:
         recipient_address: Address of the wallet to receive ETH
         amount_eth: Amount of ETH to send (as string, e.g., "0.001")
-        admin_private_key: Private key of admin wallet (defaults to ADMIN_PRIVATE_KEY env var)
+        admin_private_key: Private key of admin wallet, hex string or raw bytes
+            (defaults to ADMIN_PRIVATE_KEY env var)
         rpc_url: Base network RPC URL (defaults to BASE_RPC_URL env var or public RPC)
     
     Returns:
         Dictionary with transaction_hash and status
     """
+    w3 = None
     try:
         # Get admin wallet from environment if not provided
         if admin_private_key is None:
@@ -191,7 +398,6 @@ def send_eth_to_wallet(
         
         # Initialize Web3 connection with timeout
         # Try primary RPC, with fallback options
-        w3 = None
         rpc_endpoints = [rpc_url]
         
         # If using default, add fallback endpoints
@@ -202,94 +408,58 @@ def send_eth_to_wallet(
                 "https://base-sepolia-rpc.publicnode.com"
             ])
         
-        connection_error = None
-        for endpoint in rpc_endpoints:
-            try:
-                logger.info(f"Attempting to connect to Base Sepolia RPC: {endpoint}")
-                w3 = Web3(Web3.HTTPProvider(endpoint, request_kwargs={'timeout': 30}))
-                
-                # Test connection by making an actual RPC call (more reliable than is_connected())
-                try:
-                    chain_id = w3.eth.chain_id
-                    if chain_id == 84532:  # Base Sepolia chain ID
-                        logger.info(f"✓ Successfully connected to Base Sepolia RPC: {endpoint} (Chain ID: {chain_id})")
-                        break
-                    else:
-                        connection_error = f"Wrong chain ID {chain_id} for {endpoint} (expected 84532)"
-                        logger.warning(connection_error)
-                        w3 = None
-                except Exception as chain_test_error:
-                    # If chain_id check fails, try is_connected() as fallback
-                    if w3.is_connected():
-                        logger.info(f"✓ Successfully connected to Base Sepolia RPC: {endpoint}")
-                        break
-                    else:
-                        connection_error = f"Connection test failed for {endpoint}: {str(chain_test_error)}"
-                        logger.warning(connection_error)
-                        w3 = None
-            except Exception as e:
-                connection_error = f"Error connecting to {endpoint}: {str(e)}"
-                logger.warning(connection_error)
-                w3 = None
-                continue
-        
-        if w3 is None:
-            raise ConnectionError(
-                f"Failed to connect to any Base Sepolia RPC endpoint. "
-                f"Tried: {', '.join(rpc_endpoints)}. "
-                f"Last error: {connection_error}. "
-                f"Please set BASE_RPC_URL in environment with a valid endpoint."
-            )
+        w3 = _connect_base_sepolia(rpc_endpoints)
         
         # Get admin account
-        admin_account = Account.from_key(admin_private_key)
+        admin_account = _admin_account(admin_private_key)
         admin_address = admin_account.address
         
-        # Validate recipient address
-        if not w3.is_address(recipient_address):
+        # Validate recipient address (format check first; w3.is_address only for anything else)
+        if not (_ADDR(recipient_address) or w3.is_address(recipient_address)):
             raise ValueError(f"Invalid recipient address: {recipient_address}")
         
-        # Convert amount to Wei
-        amount_wei = w3.to_wei(float(amount_eth), 'ether')
-        
-        # Get current gas price
-        gas_price = w3.eth.gas_price
+        # Convert amount to Wei (Decimal avoids binary-float rounding, e.g. for "0.1")
+        amount_wei = w3.to_wei(Decimal(amount_eth), 'ether')
         
-        # Get nonce
-        nonce = w3.eth.get_transaction_count(admin_address)
+        # Get current base fee and nonce (one batched round-trip)
+        base_fee, nonce = _base_fee_and_nonce(w3, admin_address)
         
         # Build transaction
         transaction = {
             'to': recipient_address,
             'value': amount_wei,
             'gas': 21000,  # Standard ETH transfer gas limit
-            'gasPrice': gas_price,
+            'maxPriorityFeePerGas': _PRIORITY_FEE_WEI,
+            # 2x base fee leaves headroom for base-fee increases over the next blocks
+            'maxFeePerGas': 2 * base_fee + _PRIORITY_FEE_WEI,
+            'type': 2,
             'nonce': nonce,
-            'chainId': 84532  # Base Sepolia chain ID
+            'chainId': BASE_SEPOLIA_CHAIN_ID
         }
         
-        # Sign transaction
-        signed_txn = w3.eth.account.sign_transaction(transaction, admin_private_key)
+        # Sign transaction with the cached admin account (no per-call key derivation)
+        signed_txn = admin_account.sign_transaction(transaction)
         
         # Send transaction
         logger.info(
-            f"Sending {amount_eth} ETH from {admin_address} to {recipient_address} "
-            f"on Base Sepolia (Chain ID: 84532)"
+            "Sending %s ETH from %s to %s on Base Sepolia (Chain ID: %d)",
+            amount_eth, admin_address, recipient_address, BASE_SEPOLIA_CHAIN_ID
         )
         # Use raw_transaction (snake_case) for web3.py v6+
         tx_hash = w3.eth.send_raw_transaction(signed_txn.raw_transaction)
+        tx_hash_hex = tx_hash.hex()
         
         # Wait for transaction receipt
-        logger.info(f"Transaction sent, waiting for confirmation. Hash: {tx_hash.hex()}")
-        tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+        logger.info("Transaction sent, waiting for confirmation. Hash: %s", tx_hash_hex)
+        tx_receipt = _wait_for_receipt(w3, tx_hash, timeout=120)
         
         if tx_receipt.status == 1:
             logger.info(
-                f"✓ Successfully sent {amount_eth} ETH to {recipient_address}. "
-                f"Transaction: {tx_hash.hex()}"
+                "✓ Successfully sent %s ETH to %s. Transaction: %s",
+                amount_eth, recipient_address, tx_hash_hex
             )
             return {
-                "transaction_hash": tx_hash.hex(),
+                "transaction_hash": tx_hash_hex,
                 "status": "success",
                 "from": admin_address,
                 "to": recipient_address,
@@ -300,6 +470,9 @@ def send_eth_to_wallet(
             raise Exception(f"Transaction failed with status: {tx_receipt.status}")
             
     except Exception as e:
+        # A connection failure means the cached endpoint may be gone: probe it again next time
+        if w3 is not None and isinstance(e, OSError):
+            _VALIDATED_ENDPOINTS.discard(w3.provider.endpoint_uri)
         logger.error(f"Error sending ETH: {str(e)}", exc_info=True)
         raise
 